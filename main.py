@@ -1,38 +1,261 @@
 from dotenv import load_dotenv
 import os
 import requests
+from requests.adapters import HTTPAdapter
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 from typing import Dict, Any, Tuple, Optional
 import json
-from colorama import init, Fore, Back, Style
+from json_repair import repair_json
 import time
 import sys
-
-# Initialize colorama
-init()
-
-# Add this at the top of the file after imports
-def print_typing_effect(text, delay=0.03):
-    for char in text:
-        sys.stdout.write(char)
-        sys.stdout.flush()
-        time.sleep(delay)
-    print()
-
-def display_loading_animation(message, duration=3):
+import platform
+import hashlib
+import mmap
+import diskcache
+import threading
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+# Semantic caching is optional; without these packages only exact-match caching is used
+try:
+    import faiss
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    faiss = None
+
+def enable_ansi() -> bool:
+    """Whether the terminal understands ANSI color codes, turning on VT processing on Windows 10+"""
+    if not sys.stdout.isatty():
+        return False
+    if platform.system() != 'Windows':
+        return True
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)  # STD_OUTPUT_HANDLE
+        mode = ctypes.c_uint32()
+        if not kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            return False
+        return bool(kernel32.SetConsoleMode(handle, mode.value | 0x0004))  # ENABLE_VIRTUAL_TERMINAL_PROCESSING
+    except (AttributeError, OSError):
+        return False
+
+# Write raw ANSI codes directly; only legacy Windows consoles need colorama's stdout wrapper
+if enable_ansi():
+    class Fore:
+        RED = "\x1b[31m"
+        GREEN = "\x1b[32m"
+        YELLOW = "\x1b[33m"
+        CYAN = "\x1b[36m"
+    
+    class Style:
+        RESET_ALL = "\x1b[0m"
+else:
+    class Fore:
+        RED = GREEN = YELLOW = CYAN = ""
+    
+    class Style:
+        RESET_ALL = ""
+    
+    if platform.system() == 'Windows' and sys.stdout.isatty():
+        try:
+            from colorama import init, Fore, Style
+            init()
+        except ImportError:
+            pass
+
+# Skip the loading spinner when output isn't a terminal or FAST_UI=1 is set
+FAST_UI = os.getenv("FAST_UI") == "1" or not sys.stdout.isatty()
+
+@contextmanager
+def display_loading_animation(message):
+    """Show a spinner on a background thread while the wrapped block runs"""
+    if FAST_UI:
+        yield
+        return
+    
     animation = ["⠋", "⠙", "⠹", "⠸", "⠼", "⠴", "⠦", "⠧", "⠇", "⠏"]
-    end_time = time.time() + duration
-    i = 0
-    while time.time() < end_time:
-        sys.stdout.write(f'\r{Fore.CYAN}{message} {animation[i % len(animation)]}{Style.RESET_ALL}')
+    done = threading.Event()
+    
+    def spin():
+        i = 0
+        while not done.is_set():
+            sys.stdout.write(f'\r{Fore.CYAN}{message} {animation[i % len(animation)]}{Style.RESET_ALL}')
+            sys.stdout.flush()
+            done.wait(0.1)
+            i += 1
+        sys.stdout.write('\r' + ' ' * (len(message) + 2) + '\r')
         sys.stdout.flush()
-        time.sleep(0.1)
-        i += 1
-    sys.stdout.write('\r' + ' ' * (len(message) + 2) + '\r')
-    sys.stdout.flush()
+    
+    spinner = threading.Thread(target=spin, daemon=True)
+    spinner.start()
+    try:
+        yield
+    finally:
+        done.set()
+        spinner.join()
 
 load_dotenv()
 
+# Upper bound on worker threads; each client's ConcurrencyController decides how many actually run
+MAX_WORKERS = 16
+
+# Answers sent to Gemini per fact-extraction call
+EXTRACTION_BATCH_SIZE = 5
+
+# Fixed instructions go first so every extraction prompt shares the same prefix
+# (lets provider-side prompt caching match); the per-call items are appended after it
+EXTRACTION_SYSTEM = """You are a fact extractor. For each item in the JSON array of items at the end of this prompt, extract as many facts as possible from its answer and sources.
+
+Return a JSON array with one entry per item, exactly like this example, with no other text:
+[
+    {
+        "id": 0,
+        "facts": [
+            {
+                "title": "Clear Concise Title",
+                "content": "Detailed fact statement",
+                "citation": "URL from the item's sources, or 'No specific citation' if none"
+            }
+        ]
+    }
+]"""
+
+# Persistent cache of API responses; set LLM_CACHE_DISABLE=1 to always hit the network
+CACHE_EXPIRE = 7 * 86400
+cache = None if os.getenv("LLM_CACHE_DISABLE") else diskcache.Cache(".llm_cache")
+_MISSING = object()
+
+# Each generate_facts run has its own stop event, bound to the worker threads it submits to.
+# Calls made outside a run (question generation) have no event and are never cancelled, and
+# workers left over from an aborted run keep seeing their own, already-set event
+_run_state = threading.local()
+
+class Cancelled(Exception):
+    pass
+
+def run_with_stop(stop: threading.Event, fn, *args, **kwargs):
+    _run_state.stop = stop
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _run_state.stop = None
+
+def check_stop():
+    stop = getattr(_run_state, 'stop', None)
+    if stop is not None and stop.is_set():
+        raise Cancelled("Run cancelled")
+
+def interruptible_sleep(seconds: float):
+    stop = getattr(_run_state, 'stop', None)
+    if stop is None:
+        time.sleep(seconds)
+    elif stop.wait(seconds):
+        raise Cancelled("Run cancelled")
+
+@contextmanager
+def cancel_on_error(stop: threading.Event, futures):
+    """Stop all work if the caller stops early (error or Ctrl+C) instead of waiting for it"""
+    try:
+        yield
+    except BaseException:
+        stop.set()
+        for future in futures:
+            future.cancel()
+        raise
+
+# Fact counts per output file, keyed by filename -> (mtime, size, count)
+_stats_cache: Dict[str, Tuple[float, int, int]] = {}
+
+def cache_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\0{prompt}".encode()).hexdigest()
+
+# Rate limits and server errors are retried with exponential backoff plus jitter
+RETRY_ATTEMPTS = 8
+backoff = wait_exponential_jitter(initial=1, max=60)
+
+def is_retryable(e: BaseException) -> bool:
+    if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return isinstance(e, (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded
+    ))
+
+def wait_retry_after(retry_state) -> float:
+    """Wait as long as the server's Retry-After header asks, falling back to backoff"""
+    e = retry_state.outcome.exception()
+    response = getattr(e, 'response', None)
+    retry_after = response.headers.get("Retry-After") if isinstance(response, requests.Response) else None
+    try:
+        return min(float(retry_after), 60)
+    except (TypeError, ValueError):
+        return backoff(retry_state)
+
+api_retry = retry(
+    stop=stop_after_attempt(RETRY_ATTEMPTS),
+    wait=wait_retry_after,
+    retry=retry_if_exception(is_retryable),
+    sleep=interruptible_sleep,
+    reraise=True
+)
+
+
+class ConcurrencyController:
+    """AIMD limit on concurrent API calls: grow additively while healthy, shrink multiplicatively on errors or slow responses"""
+    def __init__(self,
+                 latency_target: float = 3.0,
+                 initial: float = 4,
+                 c_min: float = 1,
+                 c_max: float = MAX_WORKERS,
+                 alpha: float = 0.5,
+                 beta: float = 0.5,
+                 window: int = 8):
+        self.c_t = initial
+        self.c_min = c_min
+        self.c_max = c_max
+        self.alpha = alpha
+        self.beta = beta
+        self.latency_target = latency_target
+        self.latencies = deque(maxlen=window)
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.local = threading.local()
+    
+    def __enter__(self):
+        with self.condition:
+            check_stop()
+            while self.in_flight >= int(self.c_t):
+                # Wake periodically so a cancelled run doesn't leave threads blocked here
+                self.condition.wait(0.1)
+                check_stop()
+            self.in_flight += 1
+        self.local.start = time.monotonic()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        latency = time.monotonic() - self.local.start
+        with self.condition:
+            self.in_flight -= 1
+            self.latencies.append(latency)
+            average = sum(self.latencies) / len(self.latencies)
+            if exc_type is None and average <= self.latency_target:
+                self.c_t = min(self.c_max, self.c_t + self.alpha)
+            else:
+                self.c_t = max(self.c_min, self.c_t * self.beta)
+                # Start a fresh window so one slow sample doesn't keep shrinking the limit
+                self.latencies.clear()
+            self.condition.notify_all()
+        return False
+
 
 class PerplexityClient:
     def __init__(self, api_key: Optional[str] = None):
@@ -45,6 +268,15 @@ class PerplexityClient:
             "Content-Type": "application/json"
         }
         self.base_url = "https://api.perplexity.ai/chat/completions"
+        
+        # Keep connections alive across queries instead of a new TLS handshake each time
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=0))
+        self.session.headers.update(self.headers)
+        
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.concurrency = ConcurrencyController(latency_target=10.0)
     
     def query(self, 
               prompt: str, 
@@ -52,28 +284,75 @@ class PerplexityClient:
               return_sources: bool = True
     ) -> Tuple[str, list]:
         """Send a query to Perplexity API and get response with optional sources"""
+        key = cache_key(model, prompt)
+        # Single lookup, so an entry expiring between a check and a read can't raise
+        cached = cache.get(key, default=_MISSING) if cache is not None else _MISSING
+        if cached is not _MISSING:
+            answer, sources = cached
+            return answer, sources if return_sources else []
+        
+        # If the same prompt is already being fetched, wait for that call instead of repeating it
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        
+        if not owner:
+            try:
+                answer, sources = future.result()
+            except Cancelled:
+                # The owner belonged to an aborted run; fetch it ourselves unless this run is stopping too
+                check_stop()
+                return self.query(prompt, model, return_sources)
+            return answer, sources if return_sources else []
+        
+        try:
+            answer, sources = self._fetch(prompt, model)
+            if cache is not None:
+                cache.set(key, (answer, sources), expire=CACHE_EXPIRE)
+        except BaseException as e:
+            # Unregister before waking waiters so a waiter that retries becomes the new owner
+            self._release(key)
+            future.set_exception(e)
+            raise
+        self._release(key)
+        future.set_result((answer, sources))
+        
+        return answer, sources if return_sources else []
+    
+    def _release(self, key: str):
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+    
+    def _fetch(self, prompt: str, model: str) -> Tuple[str, list]:
         data = {
             "model": model,
             "messages": [{"role": "user", "content": prompt}]
         }
         
         try:
-            response = requests.post(
-                self.base_url,
-                headers=self.headers,
-                json=data
-            )
-            response.raise_for_status()
-            
-            result = response.json()
+            result = self._post(data)
             answer = result.get('choices', [{}])[0].get('message', {}).get('content', '')
-            sources = result.get('citations', []) if return_sources else []
-            
+            sources = result.get('citations', [])
             return answer, sources
             
         except requests.exceptions.RequestException as e:
             raise Exception(f"API request failed: {str(e)}")
     
+    @api_retry
+    def _post(self, data: dict) -> dict:
+        # Gate each attempt so every 429/5xx shrinks the limit and backoff sleeps don't hold a slot
+        with self.concurrency:
+            response = self.session.post(
+                self.base_url,
+                json=data,
+                timeout=30
+            )
+            response.raise_for_status()
+            return response.json()
+    
     def ask(self, prompt: str) -> str:
         """Simplified method that returns only the answer"""
         answer, _ = self.query(prompt, return_sources=False)
@@ -97,26 +376,107 @@ class GeminiClient:
             raise ValueError("GEMINI_API_KEY not found")
         
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        self.model_name = 'gemini-2.0-flash'
+        # Every prompt we send asks for JSON, so have the model return it without markdown fences
+        self.model = genai.GenerativeModel(
+            self.model_name,
+            generation_config=genai.GenerationConfig(response_mime_type="application/json")
+        )
+        # Batched extraction prompts are long, so allow more time per call before backing off
+        self.concurrency = ConcurrencyController(latency_target=30.0)
     
     def query(self, 
               prompt: str,
-              return_sources: bool = True
+              return_sources: bool = True,
+              use_cache: bool = True
     ) -> Tuple[str, list]:
         """Send a query to Gemini API and get response with optional sources"""
+        key = cache_key(self.model_name, prompt)
+        cached = cache.get(key, default=_MISSING) if use_cache and cache is not None else _MISSING
+        if cached is not _MISSING:
+            return cached, []
+        
         try:
-            response = self.model.generate_content(prompt)
-            return response.text, []  # Gemini doesn't provide sources like Perplexity
+            text = self._generate(prompt)
+            if cache is not None:
+                cache.set(key, text, expire=CACHE_EXPIRE)
+            return text, []  # Gemini doesn't provide sources like Perplexity
             
+        except Cancelled:
+            raise
         except Exception as e:
             raise Exception(f"API request failed: {str(e)}")
     
+    @api_retry
+    def _generate(self, prompt: str) -> str:
+        # Stream so chunks are received as they're generated; the whole stream is retried on failure.
+        # Each attempt is gated separately, as in PerplexityClient._post
+        with self.concurrency:
+            chunks = []
+            for chunk in self.model.generate_content(prompt, stream=True):
+                chunks.append(chunk.text)
+            return "".join(chunks)
+    
     def ask(self, prompt: str) -> str:
         """Simplified method that returns only the answer"""
         answer, _ = self.query(prompt, return_sources=False)
         return answer
 
 
+class SemanticCache:
+    """Reuse extracted facts for answers that are paraphrases of ones already seen"""
+    def __init__(self, path: str = ".llm_cache/semantic", threshold: float = 0.92):
+        self.path = path
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.encoder = SentenceTransformer('all-MiniLM-L6-v2')
+        
+        self.index = None
+        self.payloads = []
+        if os.path.exists(f"{path}.index") and os.path.exists(f"{path}.json"):
+            index = faiss.read_index(f"{path}.index")
+            with open(f"{path}.json", 'r', encoding='utf-8') as f:
+                payloads = json.load(f)
+            # Files that disagree (e.g. an older save) can't be trusted, so start over
+            if index.ntotal == len(payloads):
+                self.index, self.payloads = index, payloads
+        if self.index is None:
+            self.index = faiss.IndexFlatIP(self.encoder.get_sentence_embedding_dimension())
+    
+    def _embed(self, text: str):
+        embedding = self.encoder.encode([text], normalize_embeddings=True)
+        return np.asarray(embedding, dtype='float32')
+    
+    def get(self, text: str) -> Optional[list]:
+        """Return cached facts for the closest match above the threshold, if any"""
+        embedding = self._embed(text)
+        with self.lock:
+            if self.index.ntotal == 0:
+                return None
+            scores, ids = self.index.search(embedding, 1)
+            if scores[0][0] >= self.threshold:
+                return self.payloads[ids[0][0]]
+        return None
+    
+    def add(self, text: str, facts: list):
+        embedding = self._embed(text)
+        with self.lock:
+            self.index.add(embedding)
+            self.payloads.append(facts)
+    
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Write both files to temporaries first so an interrupted save never leaves a partial file
+        with self.lock:
+            faiss.write_index(self.index, f"{self.path}.index.tmp")
+            with open(f"{self.path}.json.tmp", 'w', encoding='utf-8') as f:
+                json.dump(self.payloads, f)
+            os.replace(f"{self.path}.index.tmp", f"{self.path}.index")
+            os.replace(f"{self.path}.json.tmp", f"{self.path}.json")
+
+
+
+
 
 
 
@@ -127,6 +487,7 @@ class FactsGenerator:
     def __init__(self):
         self.gemini = GeminiClient()
         self.perplexity = PerplexityClient()
+        self.semantic_cache = SemanticCache() if faiss is not None and cache is not None else None
     
     def generate_debate_questions(self, topic: str) -> str:
         prompt = f"""Generate 15 questions one might ask about the topic: "{topic}" when learning about it or preparing for a debate. output the questions in this json format: {{ "questions": [ "question1", "question2", ... ] }}"""
@@ -136,88 +497,143 @@ class FactsGenerator:
         cleaned_response = response.strip('`').replace('json\n', '').replace('```', '')
         return cleaned_response
 
-    def get_perplexity_answers(self, questions_json: str) -> list:
+    def extract_facts(self, batch: list) -> dict:
+        """Extract facts from a batch of (index, answer) pairs in one call"""
+        payload = [
+            {
+                "id": i,
+                "question": item['question'],
+                "answer": item['answer'],
+                "sources": item['sources'] or ["No sources available"]
+            }
+            for i, item in batch
+        ]
+        
+        prompt = EXTRACTION_SYSTEM + "\n\n---\nItems:\n" + json.dumps(payload, indent=2)
+        
+        batch_label = ", ".join(str(i + 1) for i, _ in batch)
+        # Only accept ids from this batch, so a renumbered reply can't overwrite another batch
+        allowed = {i for i, _ in batch}
+        # Repair near-valid JSON locally; only ask again if the output still isn't a list
+        for attempt in range(2):
+            try:
+                # A retry must skip the cache, which would just return the same bad output
+                result, _ = self.gemini.query(prompt, return_sources=False, use_cache=attempt == 0)
+                parsed = json.loads(repair_json(result))
+                
+                if isinstance(parsed, list) and len(parsed) > 0:
+                    facts_by_id = {}
+                    for entry in parsed:
+                        if not (isinstance(entry, dict) and isinstance(entry.get('facts'), list)):
+                            continue
+                        try:
+                            entry_id = int(entry['id'])
+                        except (KeyError, TypeError, ValueError):
+                            entry_id = None
+                        if entry_id in allowed:
+                            facts_by_id[entry_id] = entry['facts']
+                        else:
+                            print(f"Warning: Ignoring facts with missing or unknown id {entry.get('id')!r} in answers {batch_label}")
+                    return facts_by_id
+            except Cancelled:
+                return {}
+            except Exception as e:
+                print(f"Error analyzing answers {batch_label}: {str(e)}")
+                return {}
+        
+        print(f"Warning: Could not parse facts from answers {batch_label}")
+        return {}
+    
+    def generate_facts(self, questions_json: str) -> list:
+        """Answer each question with Perplexity, extracting facts with Gemini as answers arrive"""
         try:
             questions = json.loads(questions_json)['questions']
-            answers = []
-            
-            print("\nGathering answers from Perplexity...")
-            for i, question in enumerate(questions, 1):
-                print(f"Processing question {i}/{len(questions)}")
-                answer, sources = self.perplexity.query(question, return_sources=True)
-                
-                # Handle sources - they might be URLs directly or objects with URL field
-                source_urls = []
-                for source in sources:
-                    if isinstance(source, dict):
-                        url = source.get('url', 'No URL')
-                    else:
-                        url = str(source)
-                    source_urls.append(url)
-                
-                answers.append({
-                    "question": question, 
-                    "answer": answer, 
-                    "sources": source_urls
-                })
-            
-            return answers
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON format: {str(e)}")
+        
+        answers = [None] * len(questions)
+        results = [[] for _ in questions]
+        
+        print("\nGathering answers from Perplexity and analyzing them with Gemini...")
+        stop = threading.Event()
+        perplexity_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        gemini_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        try:
+            try:
+                answer_futures = {
+                    perplexity_pool.submit(run_with_stop, stop, self.perplexity.query, question, return_sources=True): (i, question)
+                    for i, question in enumerate(questions)
+                }
+                extract_futures = []
+                # Batches are fixed by question index so the extraction prompts are the same from run to run
+                # (and can hit the response cache); a batch is sent once all of its answers have arrived
+                batch_count = (len(questions) + EXTRACTION_BATCH_SIZE - 1) // EXTRACTION_BATCH_SIZE
+                arrived = [0] * batch_count
+                batches = [[] for _ in range(batch_count)]
+                
+                with cancel_on_error(stop, answer_futures), cancel_on_error(stop, extract_futures):
+                    for done, future in enumerate(as_completed(answer_futures), 1):
+                        i, question = answer_futures[future]
+                        answer, sources = future.result()
+                        print(f"Processed question {done}/{len(questions)}")
+                        
+                        # Handle sources - they might be URLs directly or objects with URL field
+                        source_urls = []
+                        for source in sources:
+                            if isinstance(source, dict):
+                                url = source.get('url', 'No URL')
+                            else:
+                                url = str(source)
+                            source_urls.append(url)
+                        
+                        answers[i] = {
+                            "question": question, 
+                            "answer": answer, 
+                            "sources": source_urls
+                        }
+                        
+                        b = i // EXTRACTION_BATCH_SIZE
+                        cached_facts = None
+                        if self.semantic_cache is not None:
+                            cached_facts = self.semantic_cache.get(f"{question}\n{answer}")
+                        if cached_facts is not None:
+                            results[i] = cached_facts
+                        else:
+                            batches[b].append((i, answers[i]))
+                        
+                        # Start extracting as soon as a batch is complete instead of waiting for every answer
+                        arrived[b] += 1
+                        if arrived[b] == min(EXTRACTION_BATCH_SIZE, len(questions) - b * EXTRACTION_BATCH_SIZE) and batches[b]:
+                            extract_futures.append(gemini_pool.submit(run_with_stop, stop, self.extract_facts, sorted(batches[b], key=lambda pair: pair[0])))
+                    
+                    for done, future in enumerate(as_completed(extract_futures), 1):
+                        for i, parsed_facts in future.result().items():
+                            results[i] = parsed_facts
+                            if self.semantic_cache is not None and parsed_facts:
+                                item = answers[i]
+                                self.semantic_cache.add(f"{item['question']}\n{item['answer']}", parsed_facts)
+                        print(f"Analyzed batch {done}/{len(extract_futures)}")
+            finally:
+                # After a cancel, don't block on requests that are already on the wire; their results are dropped
+                wait = not stop.is_set()
+                perplexity_pool.shutdown(wait=wait)
+                gemini_pool.shutdown(wait=wait)
         except Exception as e:
+            # extract_facts catches and reports its own failures, so anything raised here came from Perplexity
             print(f"Error processing question: {str(e)}")
             return []
-    
-    def analyze_answers(self, answers: list) -> list:
-        facts = []
-        print("\nAnalyzing answers with Gemini...")
         
-        for i, item in enumerate(answers, 1):
-            print(f"Analyzing answer {i}/{len(answers)}")
-            sources_str = "\n".join(item['sources']) if item['sources'] else "No sources available"
-            
-            prompt = f"""You are a fact extractor. Extract as many facts as possible from this answer and its sources.
-
-Question: {item['question']}
-Answer: {item['answer']}
-Sources: {sources_str}
-
-Return a JSON array of facts exactly like this example, with no other text:
-[
-    {{
-        "title": "Clear Concise Title",
-        "content": "Detailed fact statement",
-        "citation": "URL from the provided sources, or 'No specific citation' if none"
-    }}
-]"""
-            
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    result = self.gemini.ask(prompt)
-                    # Clean and validate JSON
-                    result = result.strip()
-                    if not result.startswith('['):
-                        result = result[result.find('['):]
-                    if not result.endswith(']'):
-                        result = result[:result.rfind(']')+1]
-                    
-                    parsed_facts = json.loads(result)
-                    if isinstance(parsed_facts, list) and len(parsed_facts) > 0:
-                        facts.extend(parsed_facts)
-                        break
-                except json.JSONDecodeError as e:
-                    if attempt == max_retries - 1:
-                        print(f"Warning: Could not parse facts from answer {i} after {max_retries} attempts")
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        print(f"Error analyzing answer {i}: {str(e)}")
+        if self.semantic_cache is not None:
+            self.semantic_cache.save()
         
+        # Keep facts in question order regardless of completion order
+        facts = []
+        for parsed_facts in results:
+            facts.extend(parsed_facts)
         return facts
 
     def run(self):
         print(f"{Fore.CYAN}[*] Initializing Facts Generator...{Style.RESET_ALL}")
-        display_loading_animation("Loading AI modules", 2)
         print(f"\n{Fore.GREEN}[+] System ready!{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}[!] Type 'quit' to exit{Style.RESET_ALL}")
         
@@ -233,9 +649,7 @@ Return a JSON array of facts exactly like this example, with no other text:
                 print(f"\n{Fore.GREEN}[+] Generated questions:{Style.RESET_ALL}\n")
                 print(questions)
                 
-                display_loading_animation("Connecting to AI services", 2)
-                answers = self.get_perplexity_answers(questions)
-                facts = self.analyze_answers(answers)
+                facts = self.generate_facts(questions)
                 
                 if facts:
                     self.save_results(topic, facts)
@@ -252,36 +666,61 @@ Return a JSON array of facts exactly like this example, with no other text:
     def save_results(self, topic: str, facts: list):
         filename = f"facts_{topic.replace(' ', '_').lower()}.txt"
         
+        parts = [f"Facts about: {topic}\n", "=" * 50 + "\n\n"]
+        parts.extend(
+            f"Title: {fact['title']}\nContent: {fact['content']}\nCitation: {fact['citation']}\n{'-' * 50}\n\n"
+            for fact in facts
+        )
+        
+        # Build the whole file in memory and write it in one call
         with open(filename, 'w', encoding='utf-8') as f:
-            f.write(f"Facts about: {topic}\n")
-            f.write("=" * 50 + "\n\n")
-            
-            for fact in facts:
-                f.write(f"Title: {fact['title']}\n")
-                f.write(f"Content: {fact['content']}\n")
-                f.write(f"Citation: {fact['citation']}\n")
-                f.write("-" * 50 + "\n\n")
+            f.write("".join(parts))
 
     def count_existing_facts(self) -> list:
         """Count facts from all existing output files"""
-        fact_files = [f for f in os.listdir() if f.startswith('facts_') and f.endswith('.txt')]
         results = []
+        seen = set()
         
-        for file in fact_files:
-            fact_count = 0
-            topic = file[6:-4].replace('_', ' ').title()
-            
-            with open(file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                fact_count = content.count('Title:')  # Count occurrences of "Title:" as each fact has one
-            
-            results.append((topic, fact_count, file))
+        with os.scandir() as entries:
+            for entry in entries:
+                if not (entry.name.startswith('facts_') and entry.name.endswith('.txt') and entry.is_file()):
+                    continue
+                
+                file = entry.name
+                seen.add(file)
+                topic = file[6:-4].replace('_', ' ').title()
+                stat = entry.stat()
+                
+                # Only re-read files that changed since the last stats view
+                cached = _stats_cache.get(file)
+                if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+                    fact_count = cached[2]
+                else:
+                    fact_count = 0
+                    # mmap can't map an empty file, and there's nothing to count anyway
+                    if stat.st_size > 0:
+                        with open(file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                            fact_count = count_occurrences(mm, b'Title:')  # Each fact has one "Title:" line
+                    _stats_cache[file] = (stat.st_mtime, stat.st_size, fact_count)
+                
+                results.append((topic, fact_count, file))
+        
+        for file in set(_stats_cache) - seen:
+            del _stats_cache[file]
         
         return results
 
-# Replace the existing display_menu function with this one
-def display_menu():
-    logo = f"""
+def count_occurrences(mm: mmap.mmap, needle: bytes) -> int:
+    """Count non-overlapping occurrences of needle without decoding or copying the file"""
+    count = 0
+    pos = mm.find(needle)
+    while pos != -1:
+        count += 1
+        pos = mm.find(needle, pos + len(needle))
+    return count
+
+# Menu contents never change, so build the colored string once at import
+MENU_STR = f"""
 {Fore.CYAN}    ██████╗ ██████╗ ██╗    ██╗     ██████╗ █████╗ ██████╗ ██████╗ ███████╗
     ██╔══██╗╚════██╗██║    ██║    ██╔════╝██╔══██╗██╔══██╗██╔══██╗██╔════╝
     ██████╔╝ █████╔╝██║ █╗ ██║    ██║     ███████║██████╔╝██║  ██║███████╗
@@ -297,13 +736,16 @@ def display_menu():
 ║  [{Fore.CYAN}3{Fore.GREEN}] Exit                                                               ║
 ╚════════════════════════════════════════════════════════════════════════╝{Style.RESET_ALL}
 """
-    print_typing_effect(logo, delay=0.001)
+
+def display_menu():
+    sys.stdout.write(MENU_STR + "\n")
+    sys.stdout.flush()
 
 # Update the main block to include loading animation
 if __name__ == "__main__":
     print(f"{Fore.CYAN}[*] Initializing Pay-to-Win Cards AI...{Style.RESET_ALL}")
-    display_loading_animation("Loading system modules", 2)
-    generator = FactsGenerator()
+    with display_loading_animation("Loading system modules"):
+        generator = FactsGenerator()
     
     while True:
         display_menu()
@@ -312,8 +754,8 @@ if __name__ == "__main__":
         if choice == '1':
             generator.run()
         elif choice == '2':
-            display_loading_animation("Analyzing fact files", 1)
-            facts_stats = generator.count_existing_facts()
+            with display_loading_animation("Analyzing fact files"):
+                facts_stats = generator.count_existing_facts()
             if not facts_stats:
                 print(f"\n{Fore.YELLOW}[!] No fact files found!{Style.RESET_ALL}")
             else:
@@ -328,7 +770,7 @@ if __name__ == "__main__":
             input(f"\n{Fore.YELLOW}Press Enter to continue...{Style.RESET_ALL}")
         elif choice == '3':
             print(f"\n{Fore.GREEN}[+] Thank you for using Pay-to-Win Cards AI. Goodbye!{Style.RESET_ALL}")
-            break2
+            break
         else:
             print(f"\n{Fore.RED}[-] Invalid choice! Please try again.{Style.RESET_ALL}")
             input(f"{Fore.YELLOW}Press Enter to continue...{Style.RESET_ALL}")